@@ -1,9 +1,26 @@
+import hashlib
 import json
+import os
 import random
+import string
 import time
+import unicodedata
 from pathlib import Path
+from types import MappingProxyType
 import streamlit as st
 
+try:
+    import orjson
+    _loads = orjson.loads  # ~5x faster than stdlib json on typical banks
+
+    def _dumps_indented(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:  # orjson is optional; stdlib json is a drop-in fallback
+    _loads = json.loads
+
+    def _dumps_indented(obj) -> bytes:
+        return json.dumps(obj, indent=2).encode("utf-8")
+
 # ---------- Page setup ----------
 st.set_page_config(page_title="Practice Test", page_icon="📝", layout="centered")
 st.title("📝 Practice Test")
@@ -14,22 +31,46 @@ BASE_DIR = Path(__file__).parent
 QUESTIONS_ROOT = BASE_DIR / "questions"  # expects questions/<subject>/*.json
 
 # Optional upload (overrides built-ins if provided)
-#uploaded = st.file_uploader("Upload your JSON question file", type=["json"])
+uploaded = st.file_uploader("Upload your JSON question file", type=["json"])
 
 # ---------- Helpers ----------
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_PUNCT_TABLE = str.maketrans({c: None for c in string.punctuation})
+
+def norm_text(s) -> str:
+    """
+    Canonical form for free-text comparison: NFKC-normalized (full-width and
+    compatibility characters collapse), punctuation dropped via a C-level
+    translate table, then casefolded. Accepted answers go through this once
+    at normalize time; user input once per submit.
+    """
+    return unicodedata.normalize("NFKC", (s or "").strip()).translate(_PUNCT_TABLE).casefold()
+@st.cache_data(show_spinner=False)
+def _read_json_cached(path_str: str, mtime_ns: int):
+    """Parse a question file once per (path, mtime); reruns hit the cache."""
+    # Parse raw bytes: no Python-level UTF-8 decode into an intermediate str
+    # (both orjson and stdlib json accept bytes directly)
+    return _loads(Path(path_str).read_bytes())
+
 def read_json(path: Path):
-    """Read JSON list of questions from disk."""
-    return json.loads(path.read_text(encoding="utf-8"))
+    """Read JSON list of questions from disk (cached on path + mtime)."""
+    return _read_json_cached(str(path), path.stat().st_mtime_ns)
 
-def normalize_and_shuffle(qs, shuffle_choices: bool):
+def normalize_questions(qs):
     """
-    Normalize answers to index for MCQs if answer is text or list of texts;
-    optionally shuffle choices while keeping correct answer(s) aligned.
+    Normalize answers to index for MCQs if answer is text or list of texts,
+    and precompute the lookup fields used at submit/review time. No shuffling
+    happens here so the result is stable and cacheable per bank.
     """
     for q in qs:
+        # Display strings, cleaned once here instead of on every render
+        q["_prompt_cached"] = str(q.get("prompt", "")).strip()
+        q["_explanation_cached"] = str(q.get("explanation") or "")
+
         if q.get("choices"):
             ch = q.get("choices", [])
             ans = q.get("answer")
+            idx_of = {c: k for k, c in enumerate(ch)}  # O(1) lookups vs list.index
 
             # Normalize to indices
             if isinstance(ans, list):
@@ -38,67 +79,155 @@ def normalize_and_shuffle(qs, shuffle_choices: bool):
                 for a in ans:
                     if isinstance(a, int) and 0 <= a < len(ch):
                         idxs.append(a)
-                    elif isinstance(a, str) and a in ch:
-                        idxs.append(ch.index(a))
+                    elif isinstance(a, str) and a in idx_of:
+                        idxs.append(idx_of[a])
                 q["answer"] = sorted(set(idxs))
-            elif isinstance(ans, str) and ans in ch:
-                q["answer"] = ch.index(ans)
+            elif isinstance(ans, str) and ans in idx_of:
+                q["answer"] = idx_of[ans]
             # else: assume int or malformed; leave as-is
 
-            # Shuffle choices if requested
-            if shuffle_choices:
-                correct_idx = q.get("answer")
-                order = list(range(len(ch)))
-                random.shuffle(order)
-                q["choices"] = [ch[i] for i in order]
-
-                # Remap answer(s) to new positions
-                if isinstance(correct_idx, int) and 0 <= correct_idx < len(order):
-                    q["answer"] = order.index(correct_idx)
-                elif isinstance(correct_idx, list):
-                    remapped = []
-                    for ci in correct_idx:
-                        if isinstance(ci, int) and 0 <= ci < len(order):
-                            remapped.append(order.index(ci))
-                    q["answer"] = sorted(set(remapped))
+            # Canonical correct indices, computed once instead of per submit/review
+            ans = q.get("answer")
+            if isinstance(ans, int):
+                q["_correct_set"] = frozenset({ans})
+            elif isinstance(ans, list):
+                q["_correct_set"] = frozenset(int(x) for x in ans)
+            else:
+                q["_correct_set"] = frozenset()
+            q["_is_two_correct"] = len(q["_correct_set"]) == 2
+
+            # Small type tag (0=single index, 1=index list, 2=free text) so
+            # hot paths branch on an int instead of isinstance cascades
+            q["_ans_kind"] = 1 if isinstance(ans, list) else 0
+
+            # "A. choice" strings for the review, formatted once per bank
+            q["_labeled_choices"] = tuple(f"{LETTERS[j]}. {c}" for j, c in enumerate(ch))
+            q["choices"] = tuple(ch)
+        else:
+            # Free-text: precompute casefolded accepted answers for O(1) matching
+            ans = q.get("answer")
+            acceptable = ans if isinstance(ans, list) else [ans]
+            q["_accept_norm"] = frozenset(norm_text(a) for a in acceptable)
+            q["_accept_display"] = tuple(str(a or "") for a in acceptable)
+            q["_ans_kind"] = 2
     return qs
 
 
-def list_subjects_and_tests(root: Path):
+def freeze_questions(qs):
+    """
+    Wrap normalized questions in read-only mappings. Questions never change
+    after normalization, so the bank can be shared across sessions and quiz
+    runs without defensive copies; shuffle_question_choices copies on write.
+    """
+    return tuple(MappingProxyType(q) for q in qs)
+
+
+def _session_rng():
     """
-    Discover subjects (subfolders) and test files (json).
-    Returns: subjects (list[str]), subject_to_tests (dict[name] -> list[Path])
+    One random.Random per session. Every connected user otherwise funnels
+    through the module-global Mersenne Twister and its shared state; a
+    per-session instance keeps shuffles independent and contention-free.
     """
-    subjects = []
-    subject_to_tests = {}
-    if root.exists():
-        for sub in sorted(p for p in root.iterdir() if p.is_dir()):
-            tests = sorted(sub.glob("*.json"))
-            if tests:  # only include subjects that have at least one JSON
-                subjects.append(sub.name)
-                subject_to_tests[sub.name] = tests
-    return subjects, subject_to_tests
+    if "rng" not in st.session_state:
+        st.session_state.rng = random.Random()
+    return st.session_state.rng
+
+
+def shuffle_question_choices(q, rng):
+    """
+    Return a copy of an MCQ with its choices shuffled and every index-based
+    field remapped to the new positions. Copying keeps the cached normalized
+    bank untouched so it can be shared across quiz runs.
+    """
+    ch = q.get("choices")
+    if not ch:
+        return q
+    k = len(ch)
+    order = list(range(k))
+    rng.shuffle(order)
+    # Inverse permutation as a flat list: one pass to build, C-speed indexing
+    # to remap (vs. an order.index() scan or dict lookups per answer)
+    new_pos = [0] * k
+    for new, old in enumerate(order):
+        new_pos[old] = new
+
+    out = dict(q)
+    out["choices"] = tuple(ch[i] for i in order)
+    ans = q.get("answer")
+    if q["_ans_kind"] == 1:
+        out["answer"] = sorted(new_pos[ci] for ci in ans if 0 <= ci < k)
+    elif isinstance(ans, int) and 0 <= ans < k:
+        out["answer"] = new_pos[ans]
+    out["_correct_set"] = frozenset(new_pos[ci] for ci in q["_correct_set"] if 0 <= ci < k)
+    out["_labeled_choices"] = tuple(f"{LETTERS[j]}. {c}" for j, c in enumerate(out["choices"]))
+    return out
+
+
+@st.cache_data(show_spinner=False)
+def _list_subjects_cached(root_str: str, mtime_ns: int):
+    # os.scandir: DirEntry.is_dir() reuses the readdir results, so this is
+    # one syscall for the listing instead of a stat per entry
+    with os.scandir(root_str) as it:
+        return sorted(e.name for e in it if e.is_dir())
+
+def list_subjects(root: Path):
+    """
+    Discover subject subfolders. Keyed on the directory's mtime, so reruns
+    cost one stat and the cache invalidates the moment the folder changes.
+    Test files are not globbed here — that happens lazily in list_tests.
+    """
+    if not root.exists():
+        return []
+    return _list_subjects_cached(str(root), root.stat().st_mtime_ns)
+
+@st.cache_data(show_spinner=False)
+def _list_tests_cached(dir_str: str, mtime_ns: int):
+    """Str paths (not Path) so the cache entries stay pickle-friendly."""
+    with os.scandir(dir_str) as it:
+        return sorted(e.path for e in it if e.name.endswith(".json") and e.is_file())
+
+def list_tests(subject: str):
+    """Test files for one subject, globbed only once that subject is consulted."""
+    sub = QUESTIONS_ROOT / subject
+    if not sub.exists():
+        return []
+    return [Path(t) for t in _list_tests_cached(str(sub), sub.stat().st_mtime_ns)]
 
 # ---------- Discover content ----------
-subjects, subject_to_tests = list_subjects_and_tests(QUESTIONS_ROOT)
-SUBJECT_LABELS = ["All Subjects (mix everything)"] + [s.replace("_", " ").title() for s in subjects]
-SUBJECT_KEYS   = ["__ALL__"] + subjects  # parallel keys for internal use
+subjects = list_subjects(QUESTIONS_ROOT)
+
+@st.cache_data(show_spinner=False)
+def _subject_options(subjects_tuple: tuple):
+    """Display labels plus a label -> key map, derived once per discovery
+    result instead of rebuilt (and .index-scanned) on every rerun."""
+    labels = ["All Subjects (mix everything)"] + [s.replace("_", " ").title() for s in subjects_tuple]
+    keys = ["__ALL__"] + list(subjects_tuple)
+    return labels, dict(zip(labels, keys))
+
+SUBJECT_LABELS, SUBJECT_KEY_OF = _subject_options(tuple(subjects))
 
 # ---------- Sidebar controls ----------
 with st.sidebar:
     st.header("Settings")
 
     chosen_subject_label = st.selectbox("Subject", SUBJECT_LABELS)
-    chosen_subject_key = SUBJECT_KEYS[SUBJECT_LABELS.index(chosen_subject_label)]
+    chosen_subject_key = SUBJECT_KEY_OF[chosen_subject_label]
 
-    # Test dropdown depends on subject
+    # Test dropdown depends on subject; options are the Paths themselves (plus
+    # mix sentinels), so no label->index resolution is needed afterwards
     if chosen_subject_key == "__ALL__":
-        test_labels = ["(All tests in all subjects)"]
+        test_options = ["__ALL__"]
     else:
-        files = subject_to_tests.get(chosen_subject_key, [])
-        test_labels = ["All tests (mix in subject)"] + [p.stem for p in files]
+        test_options = ["__MIX__"] + list_tests(chosen_subject_key)
+
+    def _test_label(t):
+        if t == "__ALL__":
+            return "(All tests in all subjects)"
+        if t == "__MIX__":
+            return "All tests (mix in subject)"
+        return t.stem
 
-    chosen_test_label = st.selectbox("Test", test_labels)
+    chosen_test = st.selectbox("Test", test_options, format_func=_test_label)
 
     num_questions = st.number_input("Number of questions (0 = all)", 0, 2000, 0)
     shuffle_q = st.checkbox("Shuffle questions", True)
@@ -107,52 +236,68 @@ with st.sidebar:
     time_limit_min = st.number_input("Time limit (minutes, 0 = none)", 0, 240, 0)
 
 # ---------- Load questions ----------
-def load_questions():
-    # 1) Uploaded JSON overrides everything
-    '''
-    if uploaded is not None:
+def selected_files():
+    """Bank files behind the current sidebar selection."""
+    if chosen_subject_key == "__ALL__":
+        return [f for s in subjects for f in list_tests(s)]
+    if chosen_test == "__MIX__":
+        return list_tests(chosen_subject_key)
+    return [chosen_test]  # the widget already yields the Path itself
+
+@st.cache_resource(show_spinner=False)
+def _prepared_bank(file_sig: tuple):
+    """
+    Parse + normalize + freeze the selected bank files once per content
+    signature (tuple of (path, mtime) pairs). cache_resource hands back the
+    same frozen tuple every time — no per-call pickle copy, which is safe
+    because the questions are read-only after freeze_questions.
+    """
+    qs = []
+    seen_digests = set()
+    for path_str, _mtime in file_sig:
+        f = Path(path_str)
         try:
-            return json.load(uploaded)
+            if len(file_sig) > 1:
+                # Curators sometimes copy a bank file between subjects; skip
+                # byte-identical files so mixes don't double-weight them
+                digest = hashlib.blake2b(f.read_bytes(), digest_size=16).digest()
+                if digest in seen_digests:
+                    continue
+                seen_digests.add(digest)
+            qs.extend(read_json(f))
         except Exception as e:
-            st.error(f"Could not read uploaded file: {e}")
-            return []
-    '''
+            st.warning(f"Could not read {f.name}: {e}")
+    return freeze_questions(normalize_questions(qs))
+
+def load_questions():
+    # 1) Uploaded JSON overrides everything. Parsing only happens here (on
+    # Start), and the prepared bank is kept per upload so restarting the same
+    # quiz doesn't re-parse the file.
+    if uploaded is not None:
+        # file_id is unique per upload, so re-uploading an edited bank with
+        # the same name and size still invalidates the memo
+        key = uploaded.file_id
+        if st.session_state.get("upload_key") != key:
+            try:
+                # Parse the raw bytes directly; no intermediate decoded str copy
+                st.session_state.upload_bank = freeze_questions(
+                    normalize_questions(_loads(uploaded.getvalue())))
+                st.session_state.upload_key = key
+            except Exception as e:
+                st.error(f"Could not read uploaded file: {e}")
+                return ()
+        return st.session_state.upload_bank
     # 2) Built-ins from questions/ structure
     if not subjects:
         st.warning("No built-in question banks found. Add files under questions/<subject>/*.json or upload a JSON.")
-        return []
-
-    qs = []
-    if chosen_subject_key == "__ALL__":
-        # Mix everything across all subjects
-        for files in subject_to_tests.values():
-            for f in files:
-                try:
-                    qs.extend(read_json(f))
-                except Exception as e:
-                    st.warning(f"Could not read {f.name}: {e}")
-    else:
-        if chosen_test_label == "All tests (mix in subject)":
-            for f in subject_to_tests.get(chosen_subject_key, []):
-                try:
-                    qs.extend(read_json(f))
-                except Exception as e:
-                    st.warning(f"Could not read {f.name}: {e}")
-        else:
-            # Specific test file
-            files = subject_to_tests.get(chosen_subject_key, [])
-            # account for the "All tests" at index 0
-            idx = test_labels.index(chosen_test_label) - 1
-            if 0 <= idx < len(files):
-                f = files[idx]
-                try:
-                    qs = read_json(f)
-                except Exception as e:
-                    st.error(f"Could not read {f.name}: {e}")
-                    qs = []
-    return qs
+        return ()
 
-questions = load_questions()
+    # Resolve the source paths first; an empty selection never touches the
+    # parser or the bank cache
+    files = selected_files()
+    if not files:
+        return ()
+    return _prepared_bank(tuple((str(f), f.stat().st_mtime_ns) for f in files))
 
 # ---------- Quiz state ----------
 if "qs" not in st.session_state:
@@ -171,54 +316,118 @@ if "deadline" not in st.session_state:
 def time_left_str():
     if not st.session_state.deadline:
         return None
-    remain = int(st.session_state.deadline - time.time())
+    remain = int(st.session_state.deadline - time.monotonic())
     if remain < 0:
         remain = 0
     m, s = divmod(remain, 60)
     return f"{m:d}:{s:02d}"
 
-def init_quiz():
-    qs = questions[:]
-
-    # Sample size (random subset) if requested
-    if num_questions and num_questions > 0:
-        random.shuffle(qs)
-        qs = qs[:num_questions]
+def init_quiz(bank):
+    rng = _session_rng()
 
-    # Shuffle question order
-    if shuffle_q:
-        random.shuffle(qs)
-
-    # Normalize and (optionally) shuffle choices
-    qs = normalize_and_shuffle(qs, shuffle_choices=shuffle_c)
+    # Pick the run order as indices into the cached bank — no full-bank copy.
+    # rng.sample output is already in random order, so no extra shuffle.
+    if num_questions and 0 < num_questions < len(bank):
+        order = rng.sample(range(len(bank)), num_questions)
+    else:
+        order = list(range(len(bank)))
+        if shuffle_q:
+            rng.shuffle(order)
+
+    # Materialize only the questions in play; copies happen only when the
+    # per-run choice shuffle needs to remap fields.
+    if shuffle_c:
+        qs = [shuffle_question_choices(bank[j], rng) for j in order]
+    else:
+        qs = [bank[j] for j in order]
 
+    st.session_state.order = order
     st.session_state.qs = qs
+    # Widget keys for every question, formatted once per quiz instead of
+    # re-evaluating four f-strings on each rerun
+    st.session_state.widget_keys = [
+        (f"multi_{j}", f"radio_{j}", f"text_{j}", f"submit_{j}", f"skip_{j}")
+        for j in range(len(qs))
+    ]
     st.session_state.i = 0
     st.session_state.score = 0
     st.session_state.done = False
     st.session_state.answers = []
-    start = time.time()
+    st.session_state.review_md = None
+    st.session_state.results_blob = None
+    # Monotonic clock: the countdown can't jump on NTP/wall-clock changes
+    start = time.monotonic()
     st.session_state.deadline = (start + time_limit_min * 60) if time_limit_min else None
 
 def end_quiz():
     st.session_state.done = True
 
+def review_markdown():
+    """
+    The full review as one markdown string — a single st.markdown call
+    instead of O(questions x choices) elements, each of which would be a
+    separate frontend message. Answers don't change once the quiz is done,
+    so the blob is built once and memoized until the next init_quiz.
+    """
+    cached = st.session_state.get("review_md")
+    if cached is not None:
+        return cached
+    parts = []
+    qs = st.session_state.qs
+    for idx, rec in enumerate(st.session_state.answers, 1):
+        q = qs[rec["q_index"]]
+        labeled_choices = q.get("_labeled_choices")
+        explanation = q["_explanation_cached"]
+        parts.append(f"**Q{idx}. {q['_prompt_cached']}**")
+        if labeled_choices:
+            correct_set = q["_correct_set"]
+            for j, labeled in enumerate(labeled_choices):
+                parts.append(labeled + (" ✅" if j in correct_set else ""))
+        parts.append(f"Your answer: {rec['user']}")
+        parts.append(f"Correct: {'Yes' if rec['correct'] else 'No'}")
+        if explanation:
+            parts.append(f"*{explanation}*")
+        parts.append("---")
+    md = "\n\n".join(parts)
+    st.session_state.review_md = md
+    return md
+
+def results_blob() -> bytes:
+    """Serialized results for the download button, memoized like the review
+    blob so reruns of the finished page don't re-encode the answer list."""
+    cached = st.session_state.get("results_blob")
+    if cached is None:
+        cached = st.session_state.results_blob = _dumps_indented(st.session_state.answers)
+    return cached
+
 # ---------- Controls ----------
+# Banks are loaded only here, so sidebar clicks before Start cost no I/O.
 if st.button("Start / Restart quiz", type="primary"):
+    questions = load_questions()
     if not questions:
         st.warning("No questions loaded. Upload a JSON or add files under questions/<subject>/*.json.")
     else:
-        init_quiz()
+        # Debounce accidental double-clicks: identical settings with zero
+        # progress means the quiz was just built — skip the rebuild. A
+        # deliberate mid-quiz restart (same settings, some answers) still
+        # reinitializes.
+        # id(questions) is an exact bank identity: _prepared_bank is
+        # cache_resource, so the object only changes when the file
+        # signature does
+        token = (chosen_subject_key, str(chosen_test), num_questions,
+                 shuffle_q, shuffle_c, time_limit_min, id(questions))
+        untouched = st.session_state.get("i", 0) == 0 and not st.session_state.get("answers")
+        if not (untouched and st.session_state.get("quiz_token") == token and st.session_state.get("qs")):
+            init_quiz(questions)
+        st.session_state.quiz_token = token
 
 # ---------- Render quiz ----------
-qs = st.session_state.qs
-i = st.session_state.i
-n = len(qs)
+def render_status_bar():
+    """Header metrics + countdown check; cheap enough to rerun every second."""
+    qs = st.session_state.qs
+    i = st.session_state.i
+    n = len(qs)
 
-if n == 0:
-    st.info("Pick Subject and Test, then press Start / Restart quiz. Press Submit to go to next question")
-else:
-    # Header metrics
     cols = st.columns(3)
     with cols[0]:
         st.metric("Question", f"{min(i+1, n)}/{n}")
@@ -228,83 +437,92 @@ else:
         tl = time_left_str()
         st.metric("Time left", tl if tl is not None else "∞")
 
-    # Timer
-    if st.session_state.deadline and time.time() >= st.session_state.deadline:
+    if (not st.session_state.done
+            and st.session_state.deadline and time.monotonic() >= st.session_state.deadline):
         st.warning("⏰ Time is up!")
         end_quiz()
+        st.rerun(scope="app")  # leave the fragment so the review renders
+
+@st.fragment
+def render_quiz():
+    """
+    The interactive quiz UI. As a fragment, Submit/Skip/radio clicks rerun
+    only this block — discovery, bank loading, and the sidebar are skipped.
+    Metrics and review live inside so they stay in sync on fragment reruns.
+    """
+    qs = st.session_state.qs
+    i = st.session_state.i
+    n = len(qs)
+
+    # Poll the clock at 1 Hz only while a countdown is running; otherwise the
+    # status bar is a plain fragment that reruns with the quiz
+    ticking = st.session_state.deadline and not st.session_state.done
+    st.fragment(run_every=1 if ticking else None)(render_status_bar)()
 
     if not st.session_state.done and i < n:
+        # Bind the per-question fields once; everything below uses the locals
         q = qs[i]
-        st.subheader(q.get("prompt", ""))
+        choices = q.get("choices")
+        is_mcq = bool(choices)
+        is_two_correct = q.get("_is_two_correct", False)
+        st.subheader(q["_prompt_cached"])
 
+        k_multi, k_radio, k_text, k_submit, k_skip = st.session_state.widget_keys[i]
         answer_widget_value = None
-        is_mcq = bool(q.get("choices"))
-        is_two_correct = False
-
-        # Determine if this MCQ has exactly two correct answers
-        if is_mcq:
-            ans = q.get("answer")
-            if isinstance(ans, list) and len(ans) == 2:
-                is_two_correct = True
 
         # ----- Render input widget -----
         if is_mcq:
+            # Options are the indices themselves (rendered via format_func),
+            # so the widget hands back the chosen index directly — no
+            # list.index scan at submit time, and duplicate choice strings
+            # can't collide.
             if is_two_correct:
                 # Multi-select for exactly two correct answers
                 answer_widget_value = st.multiselect(
                     "Choose two:",
-                    q["choices"],
-                    key=f"multi_{i}",
+                    range(len(choices)),
+                    format_func=lambda j: choices[j],
+                    key=k_multi,
                 )
             else:
                 answer_widget_value = st.radio(
                     "Choose one:",
-                    q["choices"],
+                    range(len(choices)),
+                    format_func=lambda j: choices[j],
                     index=None,
-                    key=f"radio_{i}"
+                    key=k_radio
                 )
         else:
-            answer_widget_value = st.text_input("Your answer:", key=f"text_{i}")
+            answer_widget_value = st.text_input("Your answer:", key=k_text)
 
         c1, c2 = st.columns(2)
         with c1:
-            submitted = st.button("Submit", key=f"submit_{i}", type="primary")
+            submitted = st.button("Submit", key=k_submit, type="primary")
         with c2:
-            skipped = st.button("Skip", key=f"skip_{i}")
+            skipped = st.button("Skip", key=k_skip)
 
         if submitted:
             correct = False
 
             if is_mcq:
-                # Build canonical correct indices list (supports int or list[int])
-                if isinstance(q.get("answer"), int):
-                    correct_indices = [q["answer"]]
-                elif isinstance(q.get("answer"), list):
-                    correct_indices = sorted(set(int(x) for x in q["answer"]))
-                else:
-                    # Fallback: try to resolve string to index
-                    if isinstance(q.get("answer"), str) and q["answer"] in q["choices"]:
-                        correct_indices = [q["choices"].index(q["answer"])]
-                    else:
-                        correct_indices = []
+                correct_set = q["_correct_set"]
 
                 if is_two_correct:
                     # Must choose exactly two
                     if not answer_widget_value or len(answer_widget_value) != 2:
                         st.warning("Please select exactly two options before submitting.")
                         st.stop()
-                    user_indices = [q["choices"].index(v) for v in answer_widget_value]
-                    correct = set(user_indices) == set(correct_indices)
+                    correct = set(answer_widget_value) == correct_set
+                    # Record the choice texts, not indices, for the review
+                    answer_widget_value = [choices[j] for j in answer_widget_value]
                 else:
                     if answer_widget_value is None:
                         st.warning("Please select an option before submitting.")
                         st.stop()
-                    user_index = q["choices"].index(answer_widget_value)
-                    correct = (user_index == correct_indices[0] if correct_indices else False)
+                    correct = answer_widget_value in correct_set
+                    answer_widget_value = choices[answer_widget_value]
             else:
-                def norm(s): return (s or "").strip().lower()
-                acceptable = q["answer"] if isinstance(q.get("answer"), list) else [q.get("answer", "")]
-                correct = norm(answer_widget_value) in [norm(a) for a in acceptable]
+                correct = norm_text(answer_widget_value) in q["_accept_norm"]
 
             st.session_state.answers.append({
                 "q_index": i,
@@ -320,25 +538,19 @@ else:
                 else:
                     if is_mcq:
                         # Build readable correct answer text(s)
-                        if isinstance(q.get("answer"), int):
-                            ans_txts = [q["choices"][q["answer"]]] if 0 <= q["answer"] < len(q["choices"]) else []
-                        elif isinstance(q.get("answer"), list):
-                            ans_txts = [q["choices"][idx] for idx in q["answer"] if 0 <= idx < len(q["choices"])]
-                        elif isinstance(q.get("answer"), str):
-                            ans_txts = [q["answer"]]
-                        else:
-                            ans_txts = []
+                        ans_txts = [choices[idx] for idx in sorted(correct_set)
+                                    if 0 <= idx < len(choices)]
 
                         if is_two_correct:
                             st.error("❌ Incorrect. Correct answers: " + ", ".join(map(str, ans_txts)) if ans_txts else "N/A")
                         else:
                             st.error(f"❌ Incorrect. Answer: {ans_txts[0] if ans_txts else 'N/A'}")
                     else:
-                        ac = q["answer"] if isinstance(q.get("answer"), list) else [q.get("answer", "")]
                         st.error("❌ Incorrect.")
-                        st.write("Accepted answers: " + ", ".join(map(str, ac)))
-                if q.get("explanation"):
-                    st.caption(q["explanation"])
+                        st.write("Accepted answers: " + ", ".join(q["_accept_display"]))
+                explanation = q["_explanation_cached"]
+                if explanation:
+                    st.caption(explanation)
 
             st.session_state.i += 1
             if st.session_state.i >= n:
@@ -359,33 +571,15 @@ else:
         st.success("🎉 Quiz finished!")
         st.write(f"Score: **{st.session_state.score} / {len(st.session_state.qs)}**")
         with st.expander("Review answers"):
-            letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-            for idx, rec in enumerate(st.session_state.answers, 1):
-                q = st.session_state.qs[rec["q_index"]]
-                st.markdown(f"**Q{idx}. {q.get('prompt','')}**")
-                if q.get("choices"):
-                    # Determine correct indices set
-                    if isinstance(q.get("answer"), int):
-                        correct_set = {q["answer"]}
-                    elif isinstance(q.get("answer"), list):
-                        correct_set = set(q["answer"])
-                    else:
-                        if isinstance(q.get("answer"), str) and q["answer"] in q["choices"]:
-                            correct_set = {q["choices"].index(q["answer"])}
-                        else:
-                            correct_set = set()
-
-                    for j, c in enumerate(q["choices"]):
-                        mark = "✅" if j in correct_set else ""
-                        st.write(f"{letters[j]}. {c} {mark}")
-                st.write(f"Your answer: {rec['user']}")
-                st.write(f"Correct: {'Yes' if rec['correct'] else 'No'}")
-                if q.get("explanation"):
-                    st.caption(q["explanation"])
-                st.markdown("---")
+            st.markdown(review_markdown())
         st.download_button(
             "Download your results (JSON)",
-            data=json.dumps(st.session_state.answers, indent=2),
+            data=results_blob(),
             file_name="results.json",
             mime="application/json"
         )
+
+if len(st.session_state.qs) == 0:
+    st.info("Pick Subject and Test, then press Start / Restart quiz. Press Submit to go to next question")
+else:
+    render_quiz()